@@ -125,6 +125,7 @@ namespace LumiTracker.Config
 
             _ini = LoadIniSettings(IniFilePath);
             _db = LoadJObjectInternal(DbFilePath);
+            UnpackColumns(_db, "actions");
             if (File.Exists(UserConfigPath))
             {
                 _userConfig = LoadJObjectInternal(UserConfigPath);
@@ -166,6 +167,29 @@ namespace LumiTracker.Config
             return sections;
         }
 
+        // Some tables in db.json are stored as columns: { "key": [v0, v1, ...], ... }
+        // Convert them back to rows: [ { "key": v0, ... }, { "key": v1, ... }, ... ]
+        private static void UnpackColumns(JObject db, string key)
+        {
+            if (db[key] is not JObject columns)
+                return;
+
+            var rows = new JArray();
+            foreach (var column in columns.Properties())
+            {
+                var values = (JArray)column.Value;
+                for (int i = 0; i < values.Count; i++)
+                {
+                    if (i == rows.Count)
+                    {
+                        rows.Add(new JObject());
+                    }
+                    ((JObject)rows[i])[column.Name] = values[i];
+                }
+            }
+            db[key] = rows;
+        }
+
         public static string GetAssemblyVersion()
         {
             var assembly = Assembly.GetEntryAssembly()!;
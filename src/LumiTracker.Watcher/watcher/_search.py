@@ -0,0 +1,58 @@
+"""
+Hamming distance kernels for the packed (N, K) uint64 hash codes of HammingIndex.
+Uses numba when it is installed, the numpy SWAR popcount otherwise.
+"""
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+_M1  = np.uint64(0x5555555555555555)
+_M2  = np.uint64(0x3333333333333333)
+_M4  = np.uint64(0x0f0f0f0f0f0f0f0f)
+_H01 = np.uint64(0x0101010101010101)
+
+def PopcountU64(x):
+    """
+    SWAR popcount of every uint64 in x.
+    Cheaper than gathering a 256-entry byte LUT, which needs 8x the elements and a fancy-index pass.
+    """
+    x = x - ((x >> np.uint64(1)) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return (x * _H01) >> np.uint64(56)
+
+def _HammingDistances_Numpy(codes, code):
+    return PopcountU64(codes ^ code).sum(axis=-1)
+
+if numba is not None:
+    # uint64 operands only, mixing in int64 literals would promote to float64
+    _S1  = np.uint64(1)
+    _S2  = np.uint64(2)
+    _S4  = np.uint64(4)
+    _S56 = np.uint64(56)
+
+    @numba.njit("uint64(uint64)", cache=True)
+    def _Popcount64(x):
+        # llvm lowers this pattern to a single popcnt instruction
+        x = x - ((x >> _S1) & _M1)
+        x = (x & _M2) + ((x >> _S2) & _M2)
+        x = (x + (x >> _S4)) & _M4
+        return (x * _H01) >> _S56
+
+    # explicit signature, so the kernel is compiled (or loaded from cache) at import and not on the first frame.
+    # no prange: a few hundred rows are far below the cost of waking up the worker threads
+    @numba.njit("uint64[::1](uint64[:, ::1], uint64[::1])", cache=True)
+    def _HammingDistances_Numba(codes, code):
+        n, k = codes.shape
+        dists = np.zeros(n, dtype=np.uint64)
+        for i in range(n):
+            for j in range(k):
+                dists[i] += _Popcount64(codes[i, j] ^ code[j])
+        return dists
+
+    HammingDistances = _HammingDistances_Numba
+else:
+    HammingDistances = _HammingDistances_Numpy
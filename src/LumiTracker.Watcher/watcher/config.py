@@ -24,6 +24,7 @@ import logging
 logging.basicConfig(level=logging.DEBUG if cfg.DEBUG else logging.INFO,
                     format='{"level":"%(levelname)s", "data":%(message)s}')
 logging.getLogger("PIL.PngImagePlugin").setLevel(logging.WARNING)
+logging.getLogger("numba").setLevel(logging.WARNING)
 
 def _Log(log_func, message_dict, indent, **kwargs):
     if message_dict is None:
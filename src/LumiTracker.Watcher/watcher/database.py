@@ -1,6 +1,10 @@
 from annoy import AnnoyIndex
 import numpy as np
 import cv2
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 import logging
 import time
@@ -9,15 +13,23 @@ import csv
 import os
 import re
 import shutil
+import threading
+import itertools
 from pathlib import Path
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 from .config import cfg, LogDebug, LogInfo, LogWarning, LogError
 from .enums import ECtrlType, EAnnType, EActionCardType, EElementType, ECostType, ELanguage
-from .feature import CropBox, ActionCardHandler, CharacterCardHandler, FeatureDistance, GetHashSize
-from .feature import ExtractFeature_Control, ExtractFeature_Digit
+from ._search import HammingDistances
+from .feature import CropBox, ActionCardHandler, CharacterCardHandler, GetHashSize
+from .feature import ExtractFeature_Control, ExtractFeature_Digit_Batch
 
 def LoadImage(path):
+    path = str(path)
+    if path.isascii():
+        return cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    # cv2.imread can't open non-ascii paths on Windows
     return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
 
 def SaveImage(image, path, remove_alpha=False):
@@ -28,16 +40,73 @@ def SaveImage(image, path, remove_alpha=False):
     Path(path).parent.mkdir(parents=True, exist_ok=True)
     cv2.imencode(Path(path).suffix, image)[1].tofile(path)
 
+def DumpJsonBytes(data):
+    if orjson is not None:
+        # keys such as card ids are ints
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, indent=None, ensure_ascii=False).encode('utf-8')
+
+def LoadJsonBytes(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# bump when CardHandler.CropFeatureBuffer produces different pixels for the same crops
+FEATURE_CACHE_VERSION = 1
+
+def FeatureCacheKey(handler):
+    """ Everything the cached feature buffer of a card image depends on besides the image itself """
+    rects = [(crop.left, crop.top, crop.right, crop.bottom) for crop in handler.feature_crops]
+    return np.array([FEATURE_CACHE_VERSION, *itertools.chain.from_iterable(rects)], dtype=np.int64)
+
+def FeatureCachePath(image_path):
+    """ Cached feature buffer of a card image, kept under the temp dir instead of the cards checkout """
+    return os.path.join(cfg.debug_dir, "feature_cache", os.path.relpath(image_path, cfg.cards_dir) + ".npz")
+
+def LoadFeatureInput(handler, image_path, image=None):
+    """
+    Get the cropped feature buffer of a card image for the handler.
+    The buffer is cached together with its FeatureCacheKey, so rebuilds can skip png decoding and cropping
+    as long as neither the image nor the key has changed. image: image_path already decoded, if any
+    """
+    cache_path = FeatureCachePath(image_path)
+    key = FeatureCacheKey(handler)
+    if os.path.exists(cache_path) and (os.path.getmtime(cache_path) >= os.path.getmtime(image_path)):
+        # read into memory and close, the file is overwritten below if stale
+        with np.load(cache_path) as cache:
+            if np.array_equal(cache["key"], key):
+                return cache["feature_input"]
+
+    if image is None:
+        image = LoadImage(image_path)
+    if image is None:
+        LogError(info=f"Failed to load image: {image_path}")
+        exit(1)
+
+    handler.frame_buffer = image
+    handler.CropFeatureBuffer()
+    Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+    np.savez(cache_path, key=key, feature_input=handler.feature_buffer)
+    return handler.feature_buffer
+
+def GetLangNames():
+    """ Column names of the localized card names, e.g. "zh-HANS", "en-US" """
+    return [ELanguage(lang).name.replace('_', '-') for lang in range(ELanguage.NumELanguages.value)
+                if ELanguage(lang) != ELanguage.FollowSystem]
+
 def CheckHashDistances(test_name, hashs, name_func):
-    n = len(hashs)
+    # (N, K) packed uint64 words
+    H = PackFeaturesU64(hashs)
+    n = H.shape[0]
     min_dist = 100000
     close_dists = defaultdict(list)
-    for i in range(n):
-        for j in range(i + 1, n):
-            dist = FeatureDistance(hashs[i], hashs[j])
-            min_dist = min(dist, min_dist)
-            if dist <= cfg.threshold:
-                close_dists[dist].append(f'{i}{name_func(i)} <-----> {j}{name_func(j)}') 
+    # one row of the upper triangle at a time, no (N, N, B) temporary
+    for i in range(n - 1):
+        dists = HammingDistances(H[i + 1:], H[i])
+        min_dist = min(int(dists.min()), min_dist)
+        for k in np.nonzero(dists <= cfg.threshold)[0]:
+            j, dist = i + 1 + int(k), int(dists[k])
+            close_dists[dist].append(f'{i}{name_func(i)} <-----> {j}{name_func(j)}') 
     
     close_dists = {key: close_dists[key] for key in sorted(close_dists)}
     LogWarning(
@@ -47,11 +116,15 @@ def CheckHashDistances(test_name, hashs, name_func):
         close_dists=close_dists, 
         )
 
+# Apostrophes are removed, other common punctuation splits words
+_CLEAN_TABLE  = str.maketrans({"'": None, **{c: " " for c in "\"-,.!?:;/\\()[]{}"}})
+_NON_ALNUM_RE = re.compile(r"[^a-zA-Z0-9\s]")
+
 def StringToVariableName(s):
-    # Remove apostrophes
-    s = s.replace("'", "")
-    # Remove all non-alphanumeric characters except for spaces
-    s = re.sub(r"[^a-zA-Z0-9\s]", " ", s)
+    s = s.translate(_CLEAN_TABLE)
+    # Remove all remaining non-alphanumeric characters except for spaces
+    if _NON_ALNUM_RE.search(s):
+        s = _NON_ALNUM_RE.sub(" ", s)
     # Split the string by spaces
     words = s.split()
     # Capitalize the first letter of each word
@@ -59,10 +132,62 @@ def StringToVariableName(s):
     # Join the words together to form the variable name
     return "".join(words)
 
+def PackColumns(rows):
+    """
+    [{"key": v0, ...}, {"key": v1, ...}, ...] -> {"key": [v0, v1, ...], ...}
+    Rows must share the same keys.
+    """
+    if not rows:
+        return {}
+    return {key: [row[key] for row in rows] for key in rows[0]}
+
+def UnpackColumns(columns):
+    """
+    {"key": [v0, v1, ...], ...} -> [{"key": v0, ...}, {"key": v1, ...}, ...]
+    """
+    return [dict(zip(columns.keys(), values)) for values in zip(*columns.values())]
+
+def PackFeaturesU64(features):
+    """ (N, bits) binary features -> (N, K) uint64 words, zero padded to a multiple of 64 bits """
+    packed = np.packbits(np.asarray(features, dtype=bool).reshape(len(features), -1), axis=1)
+    pad = -packed.shape[1] % 8
+    if pad:
+        packed = np.pad(packed, ((0, 0), (0, pad)))
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+class HammingIndex:
+    """
+    Exact nearest neighbour search over binary hashes.
+    The card databases only hold a few hundred hashes, so a linear scan of the
+    packed codes is cheaper than an Annoy query and never misses the true nearest one.
+    """
+    def __init__(self, features):
+        # (N, K) uint64 words
+        self.codes = PackFeaturesU64(features)
+
+    def Search(self, feature, n):
+        # pack the query bits straight into the zero padded bytes of K words
+        packed = np.packbits(np.asarray(feature, dtype=bool), axis=None)
+        code   = np.zeros(self.codes.shape[1] * 8, dtype=np.uint8)
+        code[:packed.size] = packed
+        code   = code.view(np.uint64)
+        dists = HammingDistances(self.codes, code)
+        # only the top n need to be ordered
+        if n < dists.shape[0]:
+            ids = np.argpartition(dists, n - 1)[:n]
+            ids = ids[np.argsort(dists[ids], kind='stable')]
+        else:
+            ids = np.argsort(dists, kind='stable')
+        return ids.tolist(), dists[ids].tolist()
+
+# hashes of the card images are searched with HammingIndex instead of Annoy
+HAMMING_ANN_TYPES = (EAnnType.ACTIONS_A, EAnnType.ACTIONS_D, EAnnType.CHARACTERS_A, EAnnType.CHARACTERS_D)
+
 class Database:
     def __init__(self):
         self.data       = {}
         self.anns       = [None] * EAnnType.ANN_COUNT.value
+        self.hamming_indexes = {}
         self.rounds_ann = None
 
         Path(cfg.database_dir).mkdir(parents=True, exist_ok=True)
@@ -116,14 +241,12 @@ class Database:
         # sharables
         with open(os.path.join(cfg.cards_dir, "generated", "actions.csv"), 
                     mode='r', newline='', encoding='utf-8') as csv_file:
-            csv_reader = csv.DictReader(csv_file)
-            csv_data = [row for row in csv_reader]
+            csv_data = [row for row in csv.DictReader(csv_file)]
         num_sharable = len(csv_data)
         # tokens
         with open(os.path.join(cfg.cards_dir, "generated", "tokens.csv"), 
                     mode='r', newline='', encoding='utf-8') as tokens_file:
-            tokens_reader = csv.DictReader(tokens_file)
-            for row in tokens_reader:
+            for row in csv.DictReader(tokens_file):
                 row["id"] = int(row["id"]) + num_sharable
                 csv_data.append(row)
 
@@ -149,28 +272,46 @@ class Database:
         handler = ActionCardHandler()
         handler.OnResize(CropBox(0, 0, 420, 720))
 
+        # handlers own their feature buffers, so each worker thread needs its own one
+        thread_local = threading.local()
+        def ExtractCardFeatures(image_path, image=None):
+            if not hasattr(thread_local, "handler"):
+                thread_local.handler = ActionCardHandler()
+                thread_local.handler.OnResize(CropBox(0, 0, 420, 720))
+            feature_input = LoadFeatureInput(thread_local.handler, image_path, image)
+            return thread_local.handler.ExtractFeatures(feature_input)
+
         arcane_legends = []
 
         action_cards_dir = os.path.join(cfg.cards_dir, "actions")
+        # joined once, the per-card paths are plain concatenations
+        actions_root   = action_cards_dir + os.sep
+        snapshots_root = os.path.join(cfg.assets_dir, "images", "snapshots") + os.sep
         num_actions = len(csv_data)
         actions  = [None] * num_actions
         ahashs   = [None] * num_actions
         dhashs   = [None] * num_actions
-        for image_idx, row in enumerate(csv_data):
+
+        lang_names = GetLangNames()
+
+        def ProcessActionCard(image_idx, row):
             card_id = int(row["id"])
             if image_idx < num_sharable:
                 image_file = f'action_{card_id}_{row["zh-HANS"]}.png'
             else:
                 image_file = f'tokens/token_{card_id - num_sharable}_{row["zh-HANS"]}.png'
 
-            image_path = os.path.join(action_cards_dir, image_file)
-            image = LoadImage(image_path)
-            if image is None:
-                LogError(info=f"Failed to load image: {image_path}")
-                exit(1)
+            image_path = f"{actions_root}{image_file}"
+            card_type = EActionCardType[row["type"]].value
+            # the full image is only needed for snapshots and arcane legends
+            image = None
+            if save_image_assets or (card_type == EActionCardType.ArcaneLegend.value):
+                image = LoadImage(image_path)
+                if image is None:
+                    LogError(info=f"Failed to load image: {image_path}")
+                    exit(1)
         
-            snapshot_path = os.path.join(
-                cfg.assets_dir, "images", "snapshots", f"{card_id}.jpg")
+            snapshot_path = f"{snapshots_root}{card_id}.jpg"
             if save_image_assets:
                 # create snapshot
                 top    = int(row["snapshot_top"])
@@ -183,38 +324,38 @@ class Database:
                 ]
                 SaveImage(snapshot, snapshot_path)
 
-            handler.frame_buffer = image
-            ahash, dhash = handler.ExtractCardFeatures()
+            ahash, dhash = ExtractCardFeatures(image_path, image)
             # SaveImage(handler.feature_buffer, snapshot_path)
 
             cost_type = row["element"]
             # special case: talent for Attack
             if "," in row["cost"]:
                 cost_type += "Attack"
-                cost = sum([int(val) for val in row["cost"].split(",")])
+                cost = sum(map(int, row["cost"].split(",")))
             else:
                 cost = int(row["cost"])
             cost_type = ECostType[cost_type].value
 
-            name_langs = {}
-            for lang in range(ELanguage.NumELanguages.value):
-                lang = ELanguage(lang)
-                if lang == ELanguage.FollowSystem:
-                    continue
-                lang_name = lang.name.replace('_', '-')
-                name_langs[lang_name] = row[lang_name].strip()
-
-            action = {
-                **name_langs,
-                "type" : EActionCardType[row["type"]].value,
-                "cost" : (cost, cost_type),
-            }
-            if action["type"] == EActionCardType.ArcaneLegend.value:
-                arcane_legends.append((card_id, image))
-
-            ahashs[card_id]   = ahash
-            dhashs[card_id]   = dhash
-            actions[card_id]  = action
+            action = {lang_name: row[lang_name].strip() for lang_name in lang_names}
+            action["type"] = card_type
+            action["cost"] = (cost, cost_type)
+            # only keep the full image when it is needed later
+            if card_type != EActionCardType.ArcaneLegend.value:
+                image = None
+
+            return card_id, ahash, dhash, action, image
+
+        # image decoding and opencv ops release the GIL
+        # note: cv2.UMat (OpenCL) doesn't pay off here, the feature crops are assembled by numpy slicing
+        # and are tiny, and OpenCL kernels may round differently and change the shipped hashes
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            for card_id, ahash, dhash, action, image in executor.map(ProcessActionCard, range(num_actions), csv_data):
+                if image is not None:
+                    arcane_legends.append((card_id, image))
+
+                ahashs[card_id]   = ahash
+                dhashs[card_id]   = dhash
+                actions[card_id]  = action
 
         print(f"Loaded {len(ahashs)} images from {action_cards_dir}")
         self.data["actions"] = actions
@@ -222,13 +363,14 @@ class Database:
 
         # extras
         extra_cards_dir = os.path.join(action_cards_dir, "extras")
+        extras_root     = extra_cards_dir + os.sep
         extra_image_names = os.listdir(extra_cards_dir)
         num_extras = len(extra_image_names) + len(arcane_legends) * 2
         extras = [None] * num_extras
         ahash_extras = [None] * num_extras
         dhash_extras = [None] * num_extras
 
-        for extra_image_name in extra_image_names:
+        def ProcessExtraCard(extra_image_name):
             info = extra_image_name[:-4] # remove ".png"
             parts = info.split('_')
             extra_id  = int(parts[1])
@@ -236,15 +378,14 @@ class Database:
             if parts[2] == "token":
                 mapped_id += num_sharable
 
-            extra_path = os.path.join(action_cards_dir, "extras", extra_image_name)
-            image = LoadImage(extra_path)
-            if image is None:
-                LogError(info=f"Failed to load image: {extra_path}")
-                exit(1)
-        
-            handler.frame_buffer = image
-            ahash, dhash = handler.ExtractCardFeatures()
-    
+            extra_path = f"{extras_root}{extra_image_name}"
+            ahash, dhash = ExtractCardFeatures(extra_path)
+            return extra_id, mapped_id, ahash, dhash
+
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            results = list(executor.map(ProcessExtraCard, extra_image_names))
+
+        for extra_id, mapped_id, ahash, dhash in results:
             extras[extra_id] = mapped_id
             ahash_extras[extra_id] = ahash
             dhash_extras[extra_id] = dhash
@@ -261,11 +402,10 @@ class Database:
                 t = max(top, 0)
                 region = image[t:b, l:r]
 
-                buffer = np.zeros((height, width, 4), dtype=image.dtype)
-                if left < 0:
-                    buffer[-top:, -left:] = region
-                else:
-                    buffer[:720-top, :420-left] = region
+                # pad the parts of the box outside the card with transparent black
+                buffer = cv2.copyMakeBorder(region, 
+                    t - top, (top + height) - b, l - left, (left + width) - r, 
+                    cv2.BORDER_CONSTANT, value=(0, 0, 0, 0))
                 buffer = cv2.resize(buffer, (420, 720), interpolation=cv2.INTER_LANCZOS4)
                 # cv2.imshow("name", buffer)
                 # cv2.waitKey(0)
@@ -309,6 +449,8 @@ class Database:
             files = os.listdir(test_dir)
             image_files = [file for file in files if (file.lower().endswith(".png") or file.lower().endswith(".jpg"))]
             image_files = sorted(image_files)
+            # test images come in a few resolutions only, reuse one handler per resolution
+            handlers = {}
             for file in image_files:
                 image = LoadImage(os.path.join(test_dir, file))
                 begin_time = time.perf_counter()
@@ -319,12 +461,15 @@ class Database:
                     image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
                 height, width = image.shape[:2]
                 
-                handler = ActionCardHandler()
-                handler.OnResize(CropBox(0, 0, width, height))
+                handler = handlers.get((width, height))
+                if handler is None:
+                    handler = ActionCardHandler()
+                    handler.OnResize(CropBox(0, 0, width, height))
+                    handlers[(width, height)] = handler
                 handler.frame_buffer = image
                 ahash, dhash = handler.ExtractCardFeatures()
-                card_ids_a, dists_a = db.SearchByFeature(ahash, EAnnType.ACTIONS_A)
-                card_ids_d, dists_d = db.SearchByFeature(dhash, EAnnType.ACTIONS_D)
+                card_ids_a, dists_a = self.SearchByFeature(ahash, EAnnType.ACTIONS_A)
+                card_ids_d, dists_d = self.SearchByFeature(dhash, EAnnType.ACTIONS_D)
 
                 dt = time.perf_counter() - begin_time
                 name_a = actions[card_ids_a[0]]['zh-HANS']
@@ -348,51 +493,39 @@ class Database:
         handler = CharacterCardHandler()
         handler.OnResize(CropBox(0, 0, 420, 720))
         characters_dir = os.path.join(cfg.cards_dir, "characters")
+        # joined once, the per-card paths are plain concatenations
+        characters_root  = characters_dir + os.sep
+        avatars_src_root = os.path.join(cfg.cards_dir, "avatars") + os.sep
+        avatars_dst_root = os.path.join(cfg.assets_dir, "images", "avatars") + os.sep
         ahashs  = [None] * num_characters
         dhashs  = [None] * num_characters
 
         talent_to_character = {}
         characters = [None] * num_characters
+        lang_names = GetLangNames()
         for idx, row in enumerate(data):
             card_id = int(row["id"])
 
-            image_path = os.path.join(characters_dir, f"character_{card_id}_{row['zh-HANS']}.png")
-            image = LoadImage(image_path)
-            if image is None:
-                LogError(info=f"Failed to load image: {image_path}")
-                exit(1)
-
-            handler.frame_buffer = image
-            ahash, dhash = handler.ExtractCardFeatures()
+            image_path = f"{characters_root}character_{card_id}_{row['zh-HANS']}.png"
+            feature_input = LoadFeatureInput(handler, image_path)
+            ahash, dhash = handler.ExtractFeatures(feature_input)
             ahashs[card_id] = ahash
             dhashs[card_id] = dhash
             # SaveImage(handler.feature_buffer, snapshot_path)
 
-            name_langs = {}
-            for lang in range(ELanguage.NumELanguages.value):
-                lang = ELanguage(lang)
-                if lang == ELanguage.FollowSystem:
-                    continue
-                lang_name = lang.name.replace('_', '-')
-                name_langs[lang_name] = row[lang_name].strip()
-                name_langs[lang_name + "_short"] = row[lang_name + "_short"].strip()
-
-            character = {
-                **name_langs,
-                "element"    : EElementType[row["element"]].value,
-                "is_monster" : True if row["is_monster"] == "1" else False,
-            }
+            character = {}
+            for lang_name in lang_names:
+                character[lang_name] = row[lang_name].strip()
+                character[lang_name + "_short"] = row[lang_name + "_short"].strip()
+            character["element"]    = EElementType[row["element"]].value
+            character["is_monster"] = True if row["is_monster"] == "1" else False
             characters[card_id] = character
             talent_id = int(row["talent_id"])
             talent_to_character[talent_id] = int(row["id"])
 
             if save_image_assets:
-                src_file = os.path.join(
-                    cfg.cards_dir, "avatars", f'avatar_{row["id"]}_{row["zh-HANS"]}.png'
-                    )
-                dst_file = os.path.join(
-                    cfg.assets_dir, "images", "avatars", f'{row["id"]}.png'
-                    )
+                src_file = f'{avatars_src_root}avatar_{row["id"]}_{row["zh-HANS"]}.png'
+                dst_file = f'{avatars_dst_root}{row["id"]}.png'
                 shutil.copy(src_file, dst_file)
 
         print(f"Loaded {num_characters} images from {characters_dir}")
@@ -416,14 +549,17 @@ class Database:
         eCharacters = [StringToVariableName(character["en-US"]) for character in self.data["characters"]]
 
         indent = 0
-        file = None
+        lines = []
         def WriteLine(line):
-            print(" " * (indent * 4) + line, file=file)
+            lines.append(" " * (indent * 4) + line)
+        def WriteFile(path):
+            # write everything at once instead of line by line
+            with open(path, mode='w', encoding='utf-8') as file:
+                file.write("\n".join(lines) + "\n")
+            lines.clear()
 
         ####################
         # c-sharp
-        file = open(os.path.join(cfg.cards_dir, "..", "src", "LumiTracker.Config", "Enums.gen.cs"), 
-                    mode='w', encoding='utf-8')
         WriteLine("// This file is generated. Do not modify.")
         WriteLine("")
         WriteLine("namespace LumiTracker.Config")
@@ -459,12 +595,10 @@ class Database:
 
         indent -= 1
         WriteLine("}")
-        file.close()
+        WriteFile(os.path.join(cfg.cards_dir, "..", "src", "LumiTracker.Config", "Enums.gen.cs"))
 
         ####################
         # python
-        file = open(os.path.join(cfg.cards_dir, "..", "src", "LumiTracker.Watcher", "watcher", "_enums_gen.py"), 
-                    mode='w', encoding='utf-8')
         WriteLine("# This file is generated. Do not modify.")
         WriteLine("")
         WriteLine("import enum")
@@ -496,7 +630,7 @@ class Database:
         indent -= 1
         WriteLine("")
 
-        file.close()
+        WriteFile(os.path.join(cfg.cards_dir, "..", "src", "LumiTracker.Watcher", "watcher", "_enums_gen.py"))
 
     def _UpdateExtraInfos(self):
         # share code
@@ -520,21 +654,16 @@ class Database:
         with open(os.path.join(cfg.cards_dir, "generated", "artifacts.csv"), 
                     mode='r', newline='', encoding='utf-8') as artifacts_file:
             artifacts_reader = csv.DictReader(artifacts_file)
-            artifacts_data = [row for row in artifacts_reader]
-        artifacts_order = {}
-        for i, row in enumerate(artifacts_data):
-            internal_id = int(row["internal_id"])
-            artifacts_order[internal_id] = i
+            artifacts_order = {}
+            for i, row in enumerate(artifacts_reader):
+                internal_id = int(row["internal_id"])
+                artifacts_order[internal_id] = i
 
         self.data["artifacts_order"] = artifacts_order
 
         # digits
-        digit_hashs = [None] * 20
-        for i in range(20):
-            image = LoadImage(os.path.join(cfg.cards_dir, "digits", f"{i}.png"))
-            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
-            feature = ExtractFeature_Digit(image)
-            digit_hashs[i] = feature
+        digit_images = [LoadImage(os.path.join(cfg.cards_dir, "digits", f"{i}.png")) for i in range(20)]
+        digit_hashs = ExtractFeature_Digit_Batch(digit_images)
         ann_digits = self.CreateAndSaveAnn(digit_hashs, EAnnType.DIGITS)
         self.anns[EAnnType.DIGITS.value] = ann_digits
         if cfg.DEBUG:
@@ -562,41 +691,70 @@ class Database:
         self._UpdateGeneratedEnums(num_sharable_actions)
         self._UpdateExtraInfos()
 
-        with open(os.path.join(cfg.database_dir, cfg.db_filename), 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, indent=None, ensure_ascii=False)
+        # action cards are stored as columns, without repeating the keys for every card
+        data = {**self.data, "actions": PackColumns(self.data["actions"])}
+        with open(os.path.join(cfg.database_dir, cfg.db_filename), 'wb') as f:
+            f.write(DumpJsonBytes(data))
         
         with open("assets/config.json", 'w') as f:
             json.dump(vars(cfg), f, indent=2, ensure_ascii=False)
 
     def Load(self):
-        n_anns = EAnnType.ANN_COUNT.value
-        for i in range(n_anns):
-            hash_size = GetHashSize(EAnnType(i))
+        def LoadAnn(ann_type):
+            hash_size = GetHashSize(ann_type)
             ann_index_len = hash_size * hash_size
             ann = AnnoyIndex(ann_index_len, cfg.ann_metric)
-            ann_filename = f"{EAnnType(i).name.lower()}.ann"
-            ann.load(os.path.join(cfg.database_dir, ann_filename))
-            self.anns[i] = ann
+            ann_filename = f"{ann_type.name.lower()}.ann"
+            # mmap only, pages are read on first query
+            ann.load(os.path.join(cfg.database_dir, ann_filename), prefault=False)
+            return ann
 
-        with open(os.path.join(cfg.database_dir, cfg.db_filename), encoding='utf-8') as f:
-            self.data = json.load(f)
+        # load all indexes concurrently, so startup waits for the slowest one only
+        n_anns = EAnnType.ANN_COUNT.value
+        with ThreadPoolExecutor(max_workers=n_anns) as executor:
+            self.anns = list(executor.map(LoadAnn, [EAnnType(i) for i in range(n_anns)]))
+
+        for ann_type in HAMMING_ANN_TYPES:
+            ann = self.anns[ann_type.value]
+            features = [ann.get_item_vector(i) for i in range(ann.get_n_items())]
+            self.hamming_indexes[ann_type] = HammingIndex(features)
+
+        with open(os.path.join(cfg.database_dir, cfg.db_filename), 'rb') as f:
+            self.data = LoadJsonBytes(f.read())
+        if isinstance(self.data["actions"], dict):
+            self.data["actions"] = UnpackColumns(self.data["actions"])
     
     def CreateAndSaveAnn(self, features, ann_type):
         hash_size = GetHashSize(ann_type)
         index_len = hash_size * hash_size
         ann = AnnoyIndex(index_len, cfg.ann_metric)
-        for i in range(len(features)):
+        ann_filename = f"{ann_type.name.lower()}.ann"
+        ann_path = os.path.join(cfg.database_dir, ann_filename)
+
+        # build the largest indexes directly into the file to reduce peak memory
+        on_disk = ann_type in (EAnnType.ACTIONS_A, EAnnType.ACTIONS_D)
+        if on_disk:
+            ann.on_disk_build(ann_path)
+
+        features = np.ascontiguousarray(np.stack(features), dtype=np.float32)
+        for i in range(features.shape[0]):
             ann.add_item(i, features[i])
         ann.build(cfg.ann_n_trees)
-        ann_filename = f"{ann_type.name.lower()}.ann"
-        ann.save(os.path.join(cfg.database_dir, ann_filename))
+        if not on_disk:
+            ann.save(ann_path)
+        if ann_type in HAMMING_ANN_TYPES:
+            self.hamming_indexes[ann_type] = HammingIndex(features)
         return ann
 
     def SearchByFeature(self, feature, ann_type):
+        hamming_index = self.hamming_indexes.get(ann_type)
+        if hamming_index is not None:
+            return hamming_index.Search(feature, n=4)
+
         ann = self.anns[ann_type.value]
 
-        # !!!!! Must use a large n, or it may not find the optimal result !!!!!
-        ids, dists = ann.get_nns_by_vector(feature, n=20, include_distances=True)
+        # recall is controlled by search_k, not by n; callers only look at the top 4
+        ids, dists = ann.get_nns_by_vector(feature, n=4, search_k=cfg.ann_search_k, include_distances=True)
         return ids, dists
     
     def GetFeatureById(self, target_id, ann_type):
@@ -1,6 +1,7 @@
 import numpy as np
 import cv2
 from abc import ABC, abstractmethod
+from functools import lru_cache
 
 from .config import LogWarning, cfg, LogDebug, override
 from .enums import EAnnType, EActionCard, ECharacterCard
@@ -78,57 +79,6 @@ def GetHashSize(ann_type):
     # else:
     #     return 10
 
-class ImageHash:
-    """
-    Hash encapsulation. Can be used for dictionary keys and comparisons.
-    Reference: https://github.com/JohannesBuchner/imagehash/blob/master/imagehash/__init__.py
-    """
-
-    def _binary_array_to_hex(arr):
-        """
-        internal function to make a hex string out of a binary array.
-        """
-        bit_string = ''.join(str(b) for b in 1 * arr.flatten())
-        width = int(np.ceil(len(bit_string) / 4))
-        return '{:0>{width}x}'.format(int(bit_string, 2), width=width)
-
-    def __init__(self, binary_array):
-        self.hash = binary_array
-
-    def __str__(self):
-        return ImageHash._binary_array_to_hex(self.hash.flatten())
-
-    def __repr__(self):
-        return repr(self.hash)
-
-    def __sub__(self, other):
-        # type: (ImageHash) -> int
-        if other is None:
-            raise TypeError('Other hash must not be None.')
-        if self.hash.size != other.hash.size:
-            raise TypeError('ImageHashes must be of the same shape.', self.hash.shape, other.hash.shape)
-        return np.count_nonzero(self.hash.flatten() != other.hash.flatten())
-
-    def __eq__(self, other):
-        # type: (object) -> bool
-        if other is None:
-            return False
-        return np.array_equal(self.hash.flatten(), other.hash.flatten())  # type: ignore
-
-    def __ne__(self, other):
-        # type: (object) -> bool
-        if other is None:
-            return False
-        return not np.array_equal(self.hash.flatten(), other.hash.flatten())  # type: ignore
-
-    def __hash__(self):
-        # this returns a 8 bit integer, intentionally shortening the information
-        return sum([2**(i % 8) for i, v in enumerate(self.hash.flatten()) if v])
-
-    def __len__(self):
-        # Returns the bit length of the hash
-        return self.hash.size
-
 def AHash(gray_image, hash_size=8, mean=np.median):
     """
     Average Hash computation
@@ -143,7 +93,7 @@ def AHash(gray_image, hash_size=8, mean=np.median):
 
     avg = mean(gray_image)
     diff = gray_image > avg
-    return ImageHash(diff)
+    return diff.ravel()
 
 def DHash(gray_image, hash_size=8):
     """
@@ -160,7 +110,7 @@ def DHash(gray_image, hash_size=8):
     # compute differences between columns
     diff = gray_image[:, 1:] > gray_image[:, :-1]
 
-    return ImageHash(diff)
+    return diff.ravel()
 
 
 def DHashVertical(gray_image, hash_size=8):
@@ -178,7 +128,17 @@ def DHashVertical(gray_image, hash_size=8):
     # compute differences between rows
     diff = gray_image[1:, :] > gray_image[:-1, :]
 
-    return ImageHash(diff)
+    return diff.ravel()
+
+def LowerMedian(values):
+    """
+    The lower middle element of values, a single partition instead of np.median's two plus the mean.
+    Nothing lies strictly between the two middle elements,
+    so (values > LowerMedian(values)) == (values > np.median(values))
+    """
+    flat = values.ravel()
+    k = (flat.size - 1) // 2
+    return np.partition(flat, k)[k]
 
 def PHash_A(gray_image, hash_size=8):
     """
@@ -200,10 +160,10 @@ def PHash_A(gray_image, hash_size=8):
     dct = cv2.dct(gray_image)
 
     dctlowfreq = dct[:hash_size, :hash_size]
-    med = np.median(dctlowfreq)
+    med = LowerMedian(dctlowfreq)
     diff = dctlowfreq > med
     
-    return ImageHash(diff)
+    return diff.ravel()
 
 def PHash_D(gray_image, hash_size=8):
     """
@@ -220,6 +180,8 @@ def PHash_D(gray_image, hash_size=8):
     # gray_image = cv2.resize(gray_image, (img_size, img_size), interpolation=cv2.INTER_AREA)
 
     # resize
+    # INTER_AREA weights the fractional edge pixels of each cell, an integral-image box average doesn't,
+    # which flips ~15% of the bits on control crops, and isn't faster at this output size anyway
     gray_image = cv2.resize(gray_image, (hash_size, hash_size + 1), interpolation=cv2.INTER_AREA)
     
     dct = cv2.dct(gray_image)
@@ -228,7 +190,39 @@ def PHash_D(gray_image, hash_size=8):
     dctlowfreq = dct[:hash_size + 1, :hash_size]
     diff = dctlowfreq[1:, :] > dctlowfreq[:-1, :]
     
-    return ImageHash(diff)
+    return diff.ravel()
+
+@lru_cache(maxsize=None)
+def DctMatrix(n, k):
+    """
+    First k rows of the orthonormal n-point DCT-II matrix, same scaling as cv2.dct.
+    The low frequencies of an image are DctMatrix(h, k) @ image @ DctMatrix(w, k).T
+    """
+    x = np.arange(n)
+    matrix = np.cos(np.pi * (2 * x[None, :] + 1) * np.arange(k)[:, None] / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+@lru_cache(maxsize=None)
+def ResizeMatrix(n_in, n_out, interpolation):
+    """
+    (n_out, n_in) matrix of the 1D cv2.resize along one axis, both INTER_LINEAR and INTER_AREA are separable,
+    so cv2.resize(image, (w, h)) == ResizeMatrix(H, h) @ image @ ResizeMatrix(W, w).T
+    """
+    eye = np.eye(n_in, dtype=np.float32)
+    return cv2.resize(eye, (n_in, n_out), interpolation=interpolation)
+
+@lru_cache(maxsize=256)
+def MultiPHashMatrices(height, width, target_size, hash_size):
+    """
+    The resize to target_size and the low frequency DCT of MultiPHash folded into one (left, right) pair,
+    so that dct = left @ image @ right, with no resized image in between.
+    """
+    w, h = target_size
+    interpolation = cv2.INTER_LINEAR if height < h else cv2.INTER_AREA
+    left  = DctMatrix(h, hash_size + 1).astype(np.float64) @ ResizeMatrix(height, h, interpolation)
+    right = DctMatrix(w, hash_size).astype(np.float64) @ ResizeMatrix(width, w, interpolation)
+    return left.astype(np.float32), np.ascontiguousarray(right.T, dtype=np.float32)
 
 def MultiPHash(gray_image, target_size, hash_size=8):
     """
@@ -244,27 +238,28 @@ def MultiPHash(gray_image, target_size, hash_size=8):
     # img_size = hash_size * highfreq_factor
     # gray_image = cv2.resize(gray_image, (img_size, img_size), interpolation=cv2.INTER_AREA)
 
-    # resize
-    w, h = target_size
-    interpolation = cv2.INTER_LINEAR if gray_image.shape[0] < h else cv2.INTER_AREA
-    gray_image = cv2.resize(gray_image, (w, h), interpolation=interpolation)
-    
-    dct = cv2.dct(gray_image)
+    # resize + dct, only the low frequencies are used, skip the rest of the full cv2.dct
+    height, width = gray_image.shape
+    left, right = MultiPHashMatrices(height, width, tuple(target_size), hash_size)
+    dct = left @ gray_image @ right
 
     # ahash
     dctlowfreq = dct[:hash_size, :hash_size]
-    med = np.median(dctlowfreq)
+    med = LowerMedian(dctlowfreq)
     diff = dctlowfreq > med
-    ahash = ImageHash(diff)
+    ahash = diff.ravel()
 
     # dhash vertical
     dctlowfreq = dct[:hash_size + 1, :hash_size]
     diff = dctlowfreq[1:, :] > dctlowfreq[:-1, :]
-    dhash = ImageHash(diff)
+    dhash = diff.ravel()
     
     return ahash, dhash
 
 class CropBox:
+    # created for every region on resize and read on every tick, no per instance dict
+    __slots__ = ('left', 'top', 'right', 'bottom')
+
     def __init__(self, left, top, right, bottom):
         self.left   = left
         self.top    = top
@@ -311,7 +306,6 @@ def ExtractFeature_Control_Grayed(gray_image):
 
     hash_size = GetHashSize(EAnnType.CTRLS)
     feature = PHash_D(gray_image, hash_size=hash_size)
-    feature = feature.hash.flatten()
 
     return feature
 
@@ -321,16 +315,26 @@ def ExtractFeature_Control(image):
 
     return ExtractFeature_Control_Grayed(gray_image)
 
-def ExtractFeature_Digit_Binalized(binary):
+def DigitHashGrid(binary, hash_size):
+    """
+    The (hash_size, hash_size) float32 grid of a binalized digit image that its average hash is taken from.
+    Shared by ExtractFeature_Digit_Binalized and ExtractFeature_Digit_Batch, so the database and the queries agree.
+    """
     # resize
     binary = cv2.resize(binary, (160, 160), interpolation=cv2.INTER_LANCZOS4)
 
     # to float buffer
-    binary = binary.astype(np.float32) / 255.0
+    # no need to normalize, comparing against the mean doesn't depend on the scale
+    binary = binary.astype(np.float32)
 
+    return cv2.resize(binary, (hash_size, hash_size), interpolation=cv2.INTER_AREA)
+
+def ExtractFeature_Digit_Binalized(binary):
     hash_size = GetHashSize(EAnnType.DIGITS)
-    feature = AHash(binary, hash_size=hash_size, mean=np.mean)
-    feature = feature.hash.flatten()
+    grid = DigitHashGrid(binary, hash_size)
+
+    # ahash
+    feature = (grid > np.mean(grid)).ravel()
 
     return feature
 
@@ -344,36 +348,59 @@ def ExtractFeature_Digit(image):
 
     return ExtractFeature_Digit_Binalized(binary)
 
-def ExtractFeature_ActionCard(image):
-    # preprocess
-    # to gray image
-    gray_image = cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+def ExtractFeature_Digit_Batch(gray_images):
+    """
+    Same as ExtractFeature_Digit for a list of gray images, returns an (N, hash_size * hash_size) feature array.
+    cv2 has no batched resize, only the thresholding against the mean is vectorized.
+    """
+    hash_size = GetHashSize(EAnnType.DIGITS)
+    batch = np.empty((len(gray_images), hash_size, hash_size), dtype=np.float32)
+    for i, gray_image in enumerate(gray_images):
+        # binalize
+        _, binary = cv2.threshold(gray_image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        batch[i] = DigitHashGrid(binary, hash_size)
+
+    batch = batch.reshape(len(gray_images), -1)
+    return batch > batch.mean(axis=1, keepdims=True)
 
+class FeatureBuffers:
+    """
+    Intermediate buffers of ExtractFeature_ActionCard for a fixed input size,
+    so that extracting features every frame doesn't allocate them again.
+    """
+    def __init__(self, height, width):
+        self.equalized = np.empty((height, width), dtype=np.uint8)
+        self.float     = np.empty((height, width), dtype=np.float32)
+
+def ExtractFeature_ActionCard(gray_image, buffers=None):
+    """
+    gray_image: the assembled gray feature buffer of a CardHandler
+    """
+    if buffers is None:
+        buffers = FeatureBuffers(gray_image.shape[0], gray_image.shape[1])
+
+    # preprocess
     # histogram equalization
-    gray_image = cv2.equalizeHist(gray_image)
+    # keep it at full resolution: equalizing after the downscale is cheaper, but moves the hashes
+    # of large card regions by ~5 bits on average and up to cfg.threshold, away from the database ones
+    gray_image = cv2.equalizeHist(gray_image, dst=buffers.equalized)
 
     # to float buffer
-    gray_image = gray_image.astype(np.float32) / 255.0
+    gray_image = np.divide(gray_image, np.float32(255.0), out=buffers.float)
 
     hash_size = GetHashSize(EAnnType.ACTIONS_A)
     ahash, dhash = MultiPHash(gray_image, target_size=cfg.feature_image_size, hash_size=hash_size)
-    ahash = ahash.hash.flatten()
-    dhash = dhash.hash.flatten()
 
     return ahash, dhash
 
-def ExtractFeature_CharacterCard(image):
-    return ExtractFeature_ActionCard(image)
-
-def FeatureDistance(feature1, feature2):
-    return ImageHash(feature1) - ImageHash(feature2)
+def ExtractFeature_CharacterCard(gray_image, buffers=None):
+    return ExtractFeature_ActionCard(gray_image, buffers)
 
 def HashToFeature(hash_str):
-    binary_string = bin(int(hash_str, 16))[2:]
-    expected_length = len(hash_str) * 4
-    binary_string = binary_string.zfill(expected_length)
-    bool_list = [bit == '1' for bit in binary_string]
-    feature = np.array(bool_list, dtype=bool)
+    # 4 bits per hex digit, pad odd lengths to whole bytes and drop the padding bits again
+    num_bits = len(hash_str) * 4
+    packed = np.frombuffer(bytes.fromhex(hash_str.zfill(len(hash_str) + len(hash_str) % 2)), dtype=np.uint8)
+    feature = np.unpackbits(packed)[-num_bits:].astype(bool)
     return feature
 
 def CardName(card_id, db, lang="zh-HANS"):
@@ -395,11 +422,52 @@ def ChracterName(card_id, db, lang="zh-HANS", is_short=False):
     key = (lang + "_short") if is_short else lang
     return db["characters"][card_id][key]
 
+def FeatureCropCfgs():
+    """
+    left, top, width, height of the feature crops, relative to the card region.
+    Read from cfg on every call, so crops tuned at runtime apply to the next resized handler.
+    """
+    return tuple(tuple(box) for box in (cfg.feature_crop_box0, cfg.feature_crop_box1, cfg.feature_crop_box2))
+
+@lru_cache(maxsize=256)
+def FeatureCropRects(width, height, crop_cfgs):
+    """
+    (left, top, right, bottom) of the 3 feature crops of a width x height card region.
+    Cached, because the handlers are resized to the same few card sizes over and over.
+    crop_cfgs: FeatureCropCfgs(), part of the cache key
+    """
+    # ////////////////////////////////
+    # //    Feature buffer
+    # //    Stacked by cropped region
+    # //    
+    # //    ---------------------
+    # //    |         |         |
+    # //    |         |         |
+    # //    |    0    |    1    |
+    # //    |         |         |
+    # //    |         |         |
+    # //    |         |---------|
+    # //    |         |         |
+    # //    |         |    2    |
+    # //    |         |         |
+    # //    |         |         |
+    # //    |---------|---------|
+    # //
+    # ////////////////////////////////
+    # np.rint rounds half to even on float64, same as round()
+    crop_cfgs = np.array(crop_cfgs, dtype=np.float64)
+    lefts, tops, widths, heights = np.rint(crop_cfgs * (width, height, width, height)).astype(int).T.tolist()
+    # crop 2 fills the rest of the right column under crop 1
+    widths[2]  = widths[1]
+    heights[2] = heights[0] - heights[1]
+    return tuple((l, t, l + w, t + h) for l, t, w, h in zip(lefts, tops, widths, heights))
+
 class CardHandler(ABC):
     def __init__(self):
         self.feature_buffer = None
-        self.crop_cfgs      = (cfg.feature_crop_box0, cfg.feature_crop_box1, cfg.feature_crop_box2)
+        self.buffers        = None  # FeatureBuffers, init when resize
         self.feature_crops  = []
+        self.feature_tiles  = []  # (crop slices of the region, tile view of feature_buffer), init when resize
 
         self.frame_buffer   = None
         self.region_buffer  = None
@@ -426,6 +494,13 @@ class CardHandler(ABC):
         raise NotImplementedError()
 
     def ExtractCardFeatures(self):
+        self.CropFeatureBuffer()
+
+        # Extract feature
+        features = self.ExtractFeatures(self.feature_buffer)
+        return features
+
+    def CropFeatureBuffer(self):
         # Get card region
         region_buffer = self.frame_buffer[
             self.crop_box.top  : self.crop_box.bottom, 
@@ -434,24 +509,12 @@ class CardHandler(ABC):
         self.region_buffer = region_buffer
 
         # Crop card and get feature buffer
-        self.feature_buffer[:self.feature_crops[0].height, :self.feature_crops[0].width] = region_buffer[
-            self.feature_crops[0].top  : self.feature_crops[0].bottom, 
-            self.feature_crops[0].left : self.feature_crops[0].right
-        ]
-
-        self.feature_buffer[:self.feature_crops[1].height, self.feature_crops[0].width:] = region_buffer[
-            self.feature_crops[1].top  : self.feature_crops[1].bottom, 
-            self.feature_crops[1].left : self.feature_crops[1].right
-        ]
-
-        self.feature_buffer[self.feature_crops[1].height:, self.feature_crops[0].width:] = region_buffer[
-            self.feature_crops[2].top  : self.feature_crops[2].bottom, 
-            self.feature_crops[2].left : self.feature_crops[2].right
-        ]
-
-        # Extract feature
-        features = self.ExtractFeatures(self.feature_buffer)
-        return features
+        # each crop is converted to gray straight into its tile, so only 1/4 of the bytes are assembled
+        for crop, tile in self.feature_tiles:
+            gray = cv2.cvtColor(region_buffer[crop], cv2.COLOR_BGRA2GRAY, dst=tile)
+            # cv2 silently allocates a new output if the crop doesn't fill the tile, e.g. clipped by the frame edge
+            if gray is not tile:
+                raise ValueError('Feature crop must be of the same size as its tile.', gray.shape, tile.shape)
 
     def Update(self, frame_buffer, db, check_next_dist=True,
                     threshold=cfg.threshold, strict_threshold=cfg.strict_threshold, _debug=False):
@@ -524,67 +587,36 @@ class CardHandler(ABC):
         return PackedResult()
     
     def OnResize(self, crop_box):
+        prev_crop_box = self.crop_box
         self.crop_box = crop_box
 
+        # feature crops are relative to the card region, so they only depend on its size
+        if (prev_crop_box is not None) and (prev_crop_box.width == crop_box.width) and (prev_crop_box.height == crop_box.height):
+            return
+
         self._ResizeFeatureCrops(crop_box.width, crop_box.height)
 
         feature_buffer_width  = self.feature_crops[0].width + self.feature_crops[1].width
         feature_buffer_height = self.feature_crops[0].height
-        self.feature_buffer = np.zeros(
-            (feature_buffer_height, feature_buffer_width, 4), dtype=np.uint8)
+        # fully overwritten by the feature crops
+        self.feature_buffer = np.empty(
+            (feature_buffer_height, feature_buffer_width), dtype=np.uint8)
+        self.buffers = FeatureBuffers(feature_buffer_height, feature_buffer_width)
+
+        # the crops and tiles are fixed until the next resize, slice them here instead of every frame
+        crop0, crop1, crop2 = self.feature_crops
+        tiles = [
+            self.feature_buffer[:crop0.height, :crop0.width],
+            self.feature_buffer[:crop1.height, crop0.width:],
+            self.feature_buffer[crop1.height:, crop0.width:],
+        ]
+        self.feature_tiles = [
+            ((slice(crop.top, crop.bottom), slice(crop.left, crop.right)), tile)
+            for crop, tile in zip(self.feature_crops, tiles)
+        ]
 
     def _ResizeFeatureCrops(self, width, height):
-        # ////////////////////////////////
-        # //    Feature buffer
-        # //    Stacked by cropped region
-        # //    
-        # //    ---------------------
-        # //    |         |         |
-        # //    |         |         |
-        # //    |    0    |    1    |
-        # //    |         |         |
-        # //    |         |         |
-        # //    |         |---------|
-        # //    |         |         |
-        # //    |         |    2    |
-        # //    |         |         |
-        # //    |         |         |
-        # //    |---------|---------|
-        # //
-        # ////////////////////////////////
-        feature_crop_l0 = round(self.crop_cfgs[0][0] * width)
-        feature_crop_t0 = round(self.crop_cfgs[0][1] * height)
-        feature_crop_w0 = round(self.crop_cfgs[0][2] * width)
-        feature_crop_h0 = round(self.crop_cfgs[0][3] * height)
-        feature_crop0 = CropBox(
-            feature_crop_l0,
-            feature_crop_t0,
-            feature_crop_l0 + feature_crop_w0,
-            feature_crop_t0 + feature_crop_h0,
-        )
-
-        feature_crop_l1 = round(self.crop_cfgs[1][0] * width)
-        feature_crop_t1 = round(self.crop_cfgs[1][1] * height)
-        feature_crop_w1 = round(self.crop_cfgs[1][2] * width)
-        feature_crop_h1 = round(self.crop_cfgs[1][3] * height)
-        feature_crop1 = CropBox(
-            feature_crop_l1,
-            feature_crop_t1,
-            feature_crop_l1 + feature_crop_w1,
-            feature_crop_t1 + feature_crop_h1,
-        )
-
-        feature_crop_l2 = round(self.crop_cfgs[2][0] * width)
-        feature_crop_t2 = round(self.crop_cfgs[2][1] * height)
-        feature_crop_w2 = feature_crop_w1
-        feature_crop_h2 = feature_crop_h0 - feature_crop_h1
-        feature_crop2 = CropBox(
-            feature_crop_l2,
-            feature_crop_t2,
-            feature_crop_l2 + feature_crop_w2,
-            feature_crop_t2 + feature_crop_h2,
-        )
-        self.feature_crops = [feature_crop0, feature_crop1, feature_crop2]
+        self.feature_crops = [CropBox(*rect) for rect in FeatureCropRects(width, height, FeatureCropCfgs())]
 
 
 class ActionCardHandler(CardHandler):
@@ -603,7 +635,7 @@ class ActionCardHandler(CardHandler):
 
     @override
     def ExtractFeatures(self, feature_buffer):
-        return ExtractFeature_ActionCard(feature_buffer)
+        return ExtractFeature_ActionCard(feature_buffer, self.buffers)
 
     @override
     def AllowEarlyReturn(self, card_id):
@@ -624,7 +656,7 @@ class CharacterCardHandler(CardHandler):
 
     @override
     def ExtractFeatures(self, feature_buffer):
-        return ExtractFeature_CharacterCard(feature_buffer)
+        return ExtractFeature_CharacterCard(feature_buffer, self.buffers)
 
     @override
     def AllowEarlyReturn(self, card_id):
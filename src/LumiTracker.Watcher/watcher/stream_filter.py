@@ -117,5 +117,11 @@ class StreamFilter:
         else:
             return self.NULL_VAL
 
+    @staticmethod
+    def FilterNullAll(filters):
+        """ Feed a null value to each of the filters, e.g. when nothing is detected in a frame. """
+        null_filter = StreamFilter.Filter
+        return [null_filter(f, f.NULL_VAL, 0) for f in filters]
+
     def PrevSignalHasLeft(self):
         return self.cooldown == 0
\ No newline at end of file
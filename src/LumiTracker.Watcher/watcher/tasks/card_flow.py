@@ -250,6 +250,8 @@ class CardFlowTask(CenterCropTask):
         self.deck_dst_size = None
         self.need_deck     = need_deck
         self.need_dump     = need_dump
+        # center cards share one size, so one handler is only resized when that size changes
+        self.card_handler  = ActionCardHandler()
         self.Reset()
     
     @override
@@ -321,8 +323,8 @@ class CardFlowTask(CenterCropTask):
             self.card_recorder[num_bboxes] = recorder
 
         invalid_count = 0
+        card_handler = self.card_handler
         for i, bbox in enumerate(bboxes):
-            card_handler = ActionCardHandler()
             card_handler.OnResize(bbox)
             card_id, dist, dists = card_handler.Update(self.frame_buffer, self.db, threshold=40, check_next_dist=False)
 
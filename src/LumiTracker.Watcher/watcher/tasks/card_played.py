@@ -6,7 +6,6 @@ from ..config import cfg, override, LogDebug, LogInfo
 from ..regions import REGIONS
 from ..feature import ActionCardHandler, CropBox, CardName
 from ..database import SaveImage
-from ..stream_filter import StreamFilter
 
 import numpy as np
 import logging
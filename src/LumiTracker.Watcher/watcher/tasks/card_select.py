@@ -12,6 +12,7 @@ class CardSelectTask(CenterCropTask):
         self.prev_counts = None
         self.cards       = []
         self.filters     = []
+        self.handlers    = []
         
         prev_cards = [] if prev_cards is None else prev_cards
         self._Reset(n_cards, prev_cards)
@@ -21,6 +22,8 @@ class CardSelectTask(CenterCropTask):
         self.prev_counts = Counter(prev_cards)
         self.cards   = [-1 for _ in range(self.n_cards)]
         self.filters = [StreamFilter(null_val=-1, window_size=10, valid_count=1, window_min_count=6) for _ in range(self.n_cards)]
+        # one handler per card slot, only resized when the detected card size changes
+        self.handlers = [ActionCardHandler() for _ in range(self.n_cards)]
 
     @override
     def Reset(self):
@@ -31,18 +34,18 @@ class CardSelectTask(CenterCropTask):
         bboxes, costs = self.DetectCenterCards()
         valid = (len(bboxes) == self.n_cards)
 
-        for i in range(self.n_cards):
-            if valid:
+        if valid:
+            card_ids = []
+            for i in range(self.n_cards):
                 bbox = bboxes[i]
-                card_handler = ActionCardHandler()
+                card_handler = self.handlers[i]
                 card_handler.OnResize(bbox)
                 card_id, dist, dists = card_handler.Update(self.frame_buffer, self.db, threshold=40, check_next_dist=False)
-            else:
-                card_id = -1
-                dist = 0
-
-            card_id = self.filters[i].Filter(card_id, dist=dist)
+                card_ids.append(self.filters[i].Filter(card_id, dist=dist))
+        else:
+            card_ids = StreamFilter.FilterNullAll(self.filters)
 
+        for i, card_id in enumerate(card_ids):
             # record last detected card_id
             if card_id >= 0:
                 self.cards[i] = card_id
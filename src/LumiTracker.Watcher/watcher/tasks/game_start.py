@@ -8,14 +8,26 @@ from ..database import SaveImage
 from ..stream_filter import StreamFilter
 
 import numpy as np
+import cv2
 import logging
 import os
 
 class GameStartTask(TaskBase):
+    # frames whose thumbnail differs from the reference by more than this (mean abs, 0~255) can't be the start banner
+    THUMB_SIZE          = 16
+    THUMB_SAMPLE_SIZE   = 64  # nearest sampled first, a direct INTER_AREA of the crop costs as much as the full detection
+    THUMB_REJECT_THRESH = 40
+    # run the full detection at least once every this many frames, so a stale reference is dropped
+    FULL_CHECK_INTERVAL = 30
+
     def __init__(self, frame_manager):
         super().__init__(frame_manager)
         self.event_type = EGameEvent.GAME_START
         self.crop_box   = None  # init when resize
+        self.ref_thumb  = None  # thumbnail of the last signaled start banner, reset when resize
+        self.pos_thumb  = None  # thumbnail of the last raw positive frame
+        self.n_rejected = 0     # frames rejected by the thumbnail since the last full detection
+        self.last_dist  = None  # dist of the last fully detected frame
         self.handlers = [CharacterCardHandler() for _ in range(6)]
         self.Reset()
 
@@ -38,6 +50,8 @@ class GameStartTask(TaskBase):
         height = round(client_height * box[3])
 
         self.crop_box = CropBox(left, top, left + width, top + height)
+        self.ref_thumb = None
+        self.pos_thumb = None
 
         box    = REGIONS[ratio_type][ERegionType.VS_ANCHOR]
         left   = round(client_width  * box[0])
@@ -67,10 +81,32 @@ class GameStartTask(TaskBase):
             self.crop_box.left : self.crop_box.right
         ]
 
-        feature = ExtractFeature_Control(buffer)
-        ctrl_ids, dists = self.db.SearchByFeature(feature, EAnnType.CTRLS)
-        start = (dists[0] <= cfg.strict_threshold) and (ctrl_ids[0] == ECtrlType.GAME_START.value)
-        start = self.filter.Filter(start, dists[0])
+        # cheap early reject, most frames are nowhere near the start banner
+        thumb = None
+        far_from_ref = False
+        if self.ref_thumb is not None:
+            thumb = self.Thumbnail(buffer)
+            far_from_ref = cv2.norm(thumb, self.ref_thumb, cv2.NORM_L1) > self.THUMB_REJECT_THRESH * thumb.size
+
+        if far_from_ref and (self.n_rejected < self.FULL_CHECK_INTERVAL):
+            self.n_rejected += 1
+            start = self.filter.Filter(False, dist=0)
+        else:
+            self.n_rejected = 0
+            feature = ExtractFeature_Control(buffer)
+            ctrl_ids, dists = self.db.SearchByFeature(feature, EAnnType.CTRLS)
+            dist  = dists[0]
+            self.last_dist = dist
+            start = (dist <= cfg.strict_threshold) and (ctrl_ids[0] == ECtrlType.GAME_START.value)
+            if start:
+                self.pos_thumb = self.Thumbnail(buffer) if thumb is None else thumb
+                # the banner no longer looks like the reference, detect with the full path until it signals again
+                if far_from_ref:
+                    self.ref_thumb = None
+            start = self.filter.Filter(start, dist)
+            # only a signaled banner becomes the reference, a single false positive never does
+            if start:
+                self.ref_thumb = self.pos_thumb
 
         self.detected = start
 
@@ -80,7 +116,7 @@ class GameStartTask(TaskBase):
             self.detect_characters = True
 
             LogInfo(
-                info=f"Game Started, last dist in window = {dists[0]}",
+                info=f"Game Started, last dist in window = {self.last_dist}",
                 type=self.event_type.name,
                 )
             if cfg.DEBUG_SAVE:
@@ -92,6 +128,13 @@ class GameStartTask(TaskBase):
             else:
                 self.Reset()
 
+    def Thumbnail(self, buffer):
+        """ THUMB_SIZE x THUMB_SIZE uint8 gray thumbnail of the BGRA start banner crop """
+        size = self.THUMB_SAMPLE_SIZE
+        sampled = cv2.resize(buffer, (size, size), interpolation=cv2.INTER_NEAREST)
+        sampled = cv2.cvtColor(sampled, cv2.COLOR_BGRA2GRAY)
+        return cv2.resize(sampled, (self.THUMB_SIZE, self.THUMB_SIZE), interpolation=cv2.INTER_AREA)
+
     def DetectCharacters(self):
         my_ctx = [0, 0] # prev, cur
         op_ctx = [0, 0]